@@ -1,3 +1,5 @@
+from functools import cached_property
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -7,4 +9,13 @@ class Settings(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=".env")
 
+    @cached_property
+    def DB_PATH(self) -> str:
+        """Filesystem path parsed out of DATABASE_URL, computed once.
+
+        `sqlite:///relative.db` -> `relative.db`,
+        `sqlite:////data/app.db` -> `/data/app.db`.
+        """
+        return self.DATABASE_URL.removeprefix("sqlite:///")
+
 settings = Settings()
\ No newline at end of file
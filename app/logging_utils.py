@@ -1,17 +1,31 @@
 import logging
-from pythonjsonlogger import jsonlogger
 import sys
 
+import orjson
+import structlog
+
+# Built once at import; orjson serializes the final dict ~2x faster than
+# the stdlib json path python-json-logger went through.
+_PROCESSORS = [
+    structlog.processors.add_log_level,
+    structlog.processors.TimeStamper(fmt="iso", utc=True, key="ts"),
+    structlog.processors.EventRenamer("message"),
+    structlog.processors.JSONRenderer(serializer=orjson.dumps),
+]
+
+
 def setup_logger(level="INFO"):
-    logger = logging.getLogger("lyftr_app")
-    handler = logging.StreamHandler(sys.stdout)
-    
-    formatter = jsonlogger.JsonFormatter(
-        '%(ts)s %(level)s %(message)s %(request_id)s %(method)s %(path)s %(status)s %(latency_ms)s'
+    structlog.configure(
+        processors=_PROCESSORS,
+        wrapper_class=structlog.make_filtering_bound_logger(
+            logging.getLevelName(level)
+        ),
+        logger_factory=structlog.BytesLoggerFactory(sys.stdout.buffer),
+        cache_logger_on_first_use=True,
     )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    logger.setLevel(level)
-    return logger
+    # .bind() materializes the concrete filtering logger immediately so
+    # callers get direct method lookups instead of the lazy proxy.
+    return structlog.get_logger("lyftr_app").bind()
+
 
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger()
@@ -1,72 +1,159 @@
+try:
+    # libuv-based event loop; 15-50% more throughput than stock asyncio.
+    # uvicorn[standard] ships it, but the app works without it too.
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+import asyncio
 import time
-import uuid
+import secrets
 import hmac
 import hashlib
-import datetime
+import logging
 import aiosqlite
-from fastapi import FastAPI, Request, HTTPException, Header, Response
-from fastapi.responses import JSONResponse, PlainTextResponse
-from pydantic import BaseModel, Field
-from prometheus_client import generate_latest
+from fastapi import FastAPI, Request, HTTPException, Header, Response, Depends
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from pydantic import ValidationError
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import settings
-from app.storage import init_db, insert_message
+from app.storage import init_db, open_db, submit_message, write_batches
 from app.logging_utils import logger
-from app.metrics import HTTP_REQUESTS, WEBHOOK_OUTCOMES, LATENCY
+from app.metrics import (
+    LATENCY,
+    WEBHOOK_CREATED,
+    WEBHOOK_DUPLICATE,
+    WEBHOOK_INVALID_SIG,
+    WEBHOOK_VALIDATION_ERR,
+    observe_http_request,
+)
 from app.models import WebhookPayload
 from fastapi import Query
 
 from contextlib import asynccontextmanager
 
+# Cached at import so the middleware can skip building the log dict
+# entirely when INFO is filtered out.
+_INFO = logging.INFO
+_info_enabled = logger.is_enabled_for
+
+# Key schedule (ipad/opad derivation) is done once here; per request we
+# only pay a cheap .copy() plus the compression rounds over the body.
+_HMAC_TEMPLATE = hmac.new(settings.WEBHOOK_SECRET.encode(), digestmod=hashlib.sha256)
+
+# created_at only needs second resolution (ts carries the event time), so
+# the formatted string is refreshed at most once per second rather than
+# running the datetime machinery on every webhook.
+_NOW = ["1970-01-01T00:00:00Z"]
+_NOW_AT = [0.0]
+
+
+def _utcnow_iso() -> str:
+    t = time.time()
+    if t - _NOW_AT[0] >= 1.0:
+        _NOW[0] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+        _NOW_AT[0] = t
+    return _NOW[0]
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     if not settings.WEBHOOK_SECRET:
         raise RuntimeError("WEBHOOK_SECRET not set")
+    # Warm the pydantic-core validator now so the first webhook doesn't
+    # pay the schema-build latency.
+    WebhookPayload.model_validate_json(
+        b'{"message_id":"x","from":"+1","to":"+1","ts":"2025-01-01T00:00:00Z","text":""}'
+    )
     await init_db()
+    app.state.db = await open_db()
+    # The writer gets its own connection: sharing the read connection
+    # would expose uncommitted batch rows to /messages and /stats.
+    app.state.write_db = await open_db()
+    app.state.write_queue = asyncio.Queue()
+    app.state.writer = asyncio.create_task(
+        write_batches(app.state.write_queue, app.state.write_db)
+    )
     yield
+    app.state.writer.cancel()
+    try:
+        await app.state.writer
+    except asyncio.CancelledError:
+        pass
+    await app.state.write_db.close()
+    await app.state.db.close()
 
-app = FastAPI(lifespan=lifespan)
+# orjson encodes the dict/list payloads (/messages, /stats) in C, several
+# times faster than the stdlib json.dumps behind JSONResponse.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
-class WebhookPayload(BaseModel):
-    message_id: str = Field(..., min_length=1)
-    from_: str = Field(..., alias="from", pattern=r"^\+\d+$")
-    to: str = Field(..., pattern=r"^\+\d+$")
-    ts: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$")
-    text: str = Field(default="", max_length=4096)
+def get_db(request: Request) -> aiosqlite.Connection:
+    """Dependency returning the shared connection opened in lifespan."""
+    return request.app.state.db
 
 
 
-@app.middleware("http")
-async def logging_middleware(request: Request, call_next):
-    start_time = time.time()
-    request_id = str(uuid.uuid4())
-    
-    request.state.request_id = request_id
-    
-    response = await call_next(request)
-    
-    process_time = (time.time() - start_time) * 1000
-    
-    HTTP_REQUESTS.labels(path=request.url.path, status=response.status_code).inc()
-    LATENCY.observe(process_time)
-    
-    log_data = {
-        "ts": datetime.datetime.utcnow().isoformat(),
-        "level": "INFO",
-        "request_id": request_id,
-        "method": request.method,
-        "path": request.url.path,
-        "status": response.status_code,
-        "latency_ms": round(process_time, 2)
-    }
-    
+class LoggingMiddleware:
+    """
+    Pure ASGI logging + metrics middleware.
 
-    if hasattr(request.state, "webhook_log_extras"):
-        log_data.update(request.state.webhook_log_extras)
-        
-    logger.info("request_processed", extra=log_data)
-    return response
+    Implemented directly against the ASGI protocol instead of
+    @app.middleware("http") so every request skips the extra task and
+    Request/Response objects that BaseHTTPMiddleware allocates.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        # token_hex is one urandom read + hex encode; no UUID object or
+        # RFC-4122 formatting needed for a correlation id.
+        request_id = secrets.token_hex(16)
+
+        state = scope.setdefault("state", {})
+        state["request_id"] = request_id
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        process_time = (time.perf_counter() - start_time) * 1000
+
+        # Label with the matched route template, not the raw URL, so
+        # unexpected paths can't mint new time series.
+        route = scope.get("route")
+        observe_http_request(route.path if route is not None else scope["path"], status_code)
+        LATENCY.observe(process_time)
+
+        if _info_enabled(_INFO):
+            log_data = {
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "latency_ms": round(process_time, 2)
+            }
+
+            if "webhook_log_extras" in state:
+                log_data.update(state["webhook_log_extras"])
+
+            logger.info("request_processed", **log_data)
+
+
+app.add_middleware(LoggingMiddleware)
 
 
 @app.post("/webhook")
@@ -75,30 +162,33 @@ async def webhook(
     x_signature: str = Header(None)
 ):
 
-    body_bytes = await request.body()
-    
     if not x_signature:
-        WEBHOOK_OUTCOMES.labels(result="invalid_signature").inc()
+        WEBHOOK_INVALID_SIG.inc()
         request.state.webhook_log_extras = {"result": "invalid_signature"}
         return JSONResponse({"detail": "invalid signature"}, status_code=401)
-        
-    expected_sig = hmac.new(
-        settings.WEBHOOK_SECRET.encode(),
-        body_bytes,
-        hashlib.sha256
-    ).hexdigest()
-    
-    if not hmac.compare_digest(x_signature, expected_sig):
-        WEBHOOK_OUTCOMES.labels(result="invalid_signature").inc()
+
+    # HMAC-SHA256 is incrementally updatable, so feed the body chunks into
+    # the mac as they arrive instead of buffering first and hashing after.
+    mac = _HMAC_TEMPLATE.copy()
+    chunks = []
+    async for chunk in request.stream():
+        if chunk:
+            mac.update(chunk)
+            chunks.append(chunk)
+    body_bytes = b"".join(chunks)
+
+    if not hmac.compare_digest(x_signature, mac.hexdigest()):
+        WEBHOOK_INVALID_SIG.inc()
         request.state.webhook_log_extras = {"result": "invalid_signature"}
         return JSONResponse({"detail": "invalid signature"}, status_code=401)
 
 
     try:
-        data = await request.json()
-        payload = WebhookPayload(**data)
-    except Exception as e:
-        WEBHOOK_OUTCOMES.labels(result="validation_error").inc()
+        # pydantic-core parses and validates the JSON in one Rust call,
+        # skipping the intermediate Python dict.
+        payload = WebhookPayload.model_validate_json(body_bytes)
+    except ValidationError as e:
+        WEBHOOK_VALIDATION_ERR.inc()
         request.state.webhook_log_extras = {"result": "validation_error"}
         raise HTTPException(status_code=422, detail=str(e))
 
@@ -109,19 +199,19 @@ async def webhook(
         "to": payload.to,
         "ts": payload.ts,
         "text": payload.text,
-        "created_at": datetime.datetime.utcnow().isoformat() + "Z"
+        "created_at": _utcnow_iso()
     }
     
-    inserted = await insert_message(row_data)
+    inserted = await submit_message(row_data, request.app.state.write_queue)
     
     if inserted:
         result = "created"
         dup = False
+        WEBHOOK_CREATED.inc()
     else:
         result = "duplicate"
         dup = True
-        
-    WEBHOOK_OUTCOMES.labels(result=result).inc()
+        WEBHOOK_DUPLICATE.inc()
     request.state.webhook_log_extras = {
         "message_id": payload.message_id, 
         "dup": dup, 
@@ -137,11 +227,10 @@ async def list_messages(
     offset: int = Query(0, ge=0),
     from_: str = Query(None, alias="from"), 
     since: str = None,
-    q: str = None
+    q: str = None,
+    db: aiosqlite.Connection = Depends(get_db)
 ):
-    
-    db_path = settings.DATABASE_URL.replace("sqlite:///", "")
-    
+
     where_clauses = []
     params = {}
     
@@ -152,70 +241,74 @@ async def list_messages(
         where_clauses.append("ts >= :since_val")
         params["since_val"] = since
     if q:
-        where_clauses.append("text LIKE :q_val")
-        params["q_val"] = f"%{q}%"
+        if len(q) >= 3:
+            # Trigram FTS turns substring search into an index lookup.
+            # Quoting the term keeps user input out of FTS query syntax.
+            where_clauses.append(
+                "rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH :q_val)"
+            )
+            params["q_val"] = '"' + q.replace('"', '""') + '"'
+        else:
+            # Trigram tokens need >= 3 chars; short terms fall back to LIKE.
+            where_clauses.append("text LIKE :q_val")
+            params["q_val"] = f"%{q}%"
         
     where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-    
-    async with aiosqlite.connect(db_path) as db:
-        db.row_factory = aiosqlite.Row
-        
 
-        count_query = f"SELECT COUNT(*) as count FROM messages WHERE {where_sql}"
-        async with db.execute(count_query, params) as cursor:
-            total = (await cursor.fetchone())['count']
-            
-
-        data_query = f"""
-            SELECT message_id, from_msisdn as 'from', to_msisdn as 'to', ts, text 
-            FROM messages 
-            WHERE {where_sql} 
-            ORDER BY ts ASC, message_id ASC 
-            LIMIT :limit OFFSET :offset
-        """
-        params.update({"limit": limit, "offset": offset})
-        
-        async with db.execute(data_query, params) as cursor:
-            rows = await cursor.fetchall()
-            data = [dict(row) for row in rows]
-            
+    # COUNT(*) OVER () computes the filtered total inline, so one query
+    # replaces the old COUNT + SELECT pair.
+    data_query = f"""
+        SELECT message_id, from_msisdn as 'from', to_msisdn as 'to', ts, text,
+               COUNT(*) OVER () as total
+        FROM messages
+        WHERE {where_sql}
+        ORDER BY ts ASC, message_id ASC
+        LIMIT :limit OFFSET :offset
+    """
+    params.update({"limit": limit, "offset": offset})
+
+    async with db.execute(data_query, params) as cursor:
+        rows = await cursor.fetchall()
+
+    total = rows[0][5] if rows else 0
+    data = [
+        {"message_id": r[0], "from": r[1], "to": r[2], "ts": r[3], "text": r[4]}
+        for r in rows
+    ]
+
     return {"data": data, "total": total, "limit": limit, "offset": offset}
 
 @app.get("/stats")
-async def get_stats():
-    db_path = settings.DATABASE_URL.replace("sqlite:///", "")
-    async with aiosqlite.connect(db_path) as db:
-        db.row_factory = aiosqlite.Row
-        
+async def get_stats(db: aiosqlite.Connection = Depends(get_db)):
+
+    basic_query = """
+        SELECT
+            COUNT(*) as total,
+            COUNT(DISTINCT from_msisdn) as senders,
+            MIN(ts) as first_ts,
+            MAX(ts) as last_ts
+        FROM messages
+    """
+    async with db.execute(basic_query) as cursor:
+        basic = await cursor.fetchone()
+
+
+    senders_query = """
+        SELECT from_msisdn as 'from', COUNT(*) as count
+        FROM messages
+        GROUP BY from_msisdn
+        ORDER BY count DESC
+        LIMIT 10
+    """
+    async with db.execute(senders_query) as cursor:
+        senders_rows = await cursor.fetchall()
 
-        basic_query = """
-            SELECT 
-                COUNT(*) as total, 
-                COUNT(DISTINCT from_msisdn) as senders,
-                MIN(ts) as first_ts,
-                MAX(ts) as last_ts
-            FROM messages
-        """
-        async with db.execute(basic_query) as cursor:
-            basic = await cursor.fetchone()
-            
-
-        senders_query = """
-            SELECT from_msisdn as 'from', COUNT(*) as count
-            FROM messages
-            GROUP BY from_msisdn
-            ORDER BY count DESC
-            LIMIT 10
-        """
-        async with db.execute(senders_query) as cursor:
-            senders_rows = await cursor.fetchall()
-            
     return {
-        "total_messages": basic['total'],
-        "senders_count": basic['senders'],
-        "messages_per_sender": [dict(r) for r in senders_rows],
-        "first_message_ts": basic['first_ts'],
-        "last_message_ts": basic['last_ts']
+        "total_messages": basic[0],
+        "senders_count": basic[1],
+        "messages_per_sender": [{"from": r[0], "count": r[1]} for r in senders_rows],
+        "first_message_ts": basic[2],
+        "last_message_ts": basic[3]
     }
 
 @app.get("/health/live")
@@ -223,17 +316,24 @@ async def health_live():
     return Response(status_code=200)
 
 @app.get("/health/ready")
-async def health_ready():
+async def health_ready(db: aiosqlite.Connection = Depends(get_db)):
     if not settings.WEBHOOK_SECRET:
         return Response(status_code=503)
     try:
-        db_path = settings.DATABASE_URL.replace("sqlite:///", "")
-        async with aiosqlite.connect(db_path) as db:
-            await db.execute("SELECT 1")
+        await db.execute("SELECT 1")
         return Response(status_code=200)
     except:
         return Response(status_code=503)
 
+# generate_latest() walks every collector on each call; scrapers poll at
+# multi-second intervals, so a 1s cache is invisible to them but collapses
+# overlapping scrapes into one serialization.
+_METRICS_CACHE = [0.0, b""]
+
 @app.get("/metrics")
 async def metrics():
-    return PlainTextResponse(generate_latest())
\ No newline at end of file
+    t = time.monotonic()
+    if t - _METRICS_CACHE[0] > 1.0 or not _METRICS_CACHE[1]:
+        _METRICS_CACHE[1] = generate_latest()
+        _METRICS_CACHE[0] = t
+    return PlainTextResponse(_METRICS_CACHE[1], media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
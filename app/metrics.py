@@ -12,8 +12,43 @@ WEBHOOK_OUTCOMES = Counter(
     ["result"]
 )
 
+# Children bound once at import; handlers .inc() these directly instead
+# of paying the .labels() lookup per request.
+WEBHOOK_CREATED = WEBHOOK_OUTCOMES.labels(result="created")
+WEBHOOK_DUPLICATE = WEBHOOK_OUTCOMES.labels(result="duplicate")
+WEBHOOK_INVALID_SIG = WEBHOOK_OUTCOMES.labels(result="invalid_signature")
+WEBHOOK_VALIDATION_ERR = WEBHOOK_OUTCOMES.labels(result="validation_error")
+
 LATENCY = Histogram(
     "request_latency_ms",
     "Request latency in ms",
-    buckets=[100, 500, float("inf")]
-)
\ No newline at end of file
+    buckets=[0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf")]
+)
+
+# Route templates allowed as path label values; anything else (random
+# 404 probes, trailing slashes) is bucketed to keep cardinality bounded.
+KNOWN_PATHS = frozenset({
+    "/webhook",
+    "/messages",
+    "/stats",
+    "/health/live",
+    "/health/ready",
+    "/metrics",
+})
+OTHER_PATH = "__other__"
+
+_http_request_children = {}
+
+
+def observe_http_request(path: str, status: int):
+    """Increment HTTP_REQUESTS, caching the bound label child per
+    (path, status) so the hot path skips Counter.labels()."""
+    if path not in KNOWN_PATHS:
+        path = OTHER_PATH
+    key = (path, status)
+    child = _http_request_children.get(key)
+    if child is None:
+        child = _http_request_children.setdefault(
+            key, HTTP_REQUESTS.labels(path=path, status=status)
+        )
+    child.inc()
\ No newline at end of file
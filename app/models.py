@@ -1,4 +1,8 @@
-from pydantic import BaseModel, Field
+import re
+
+from pydantic import BaseModel, Field, field_validator
+
+_MSISDN_RE = re.compile(r"^\+\d+$")
 
 INIT_SCRIPT = """
 CREATE TABLE IF NOT EXISTS messages (
@@ -9,12 +13,59 @@ CREATE TABLE IF NOT EXISTS messages (
     text TEXT,
     created_at TEXT NOT NULL
 );
+
+-- Matches ORDER BY ts, message_id and the ts >= :since range filter.
+CREATE INDEX IF NOT EXISTS idx_messages_ts_id ON messages(ts, message_id);
+
+-- Serves the from= filter in /messages and GROUP BY from_msisdn in /stats.
+CREATE INDEX IF NOT EXISTS idx_messages_from ON messages(from_msisdn);
+
+-- Trigram FTS index over text so q= substring search stops full-scanning;
+-- external content keeps the text stored once, triggers keep it in sync.
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    INSERT INTO messages_fts(rowid, text) VALUES (new.rowid, new.text);
+END;
 """
 
 
 class WebhookPayload(BaseModel):
     message_id: str = Field(..., min_length=1)
-    from_: str = Field(..., alias="from", pattern=r"^\+\d+$")
-    to: str = Field(..., pattern=r"^\+\d+$")
-    ts: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z$")
-    text: str = Field(default="", max_length=4096)
\ No newline at end of file
+    from_: str = Field(..., alias="from")
+    to: str
+    ts: str
+    text: str = Field(default="", max_length=4096)
+
+    @field_validator("from_", "to")
+    @classmethod
+    def check_msisdn(cls, v: str) -> str:
+        # fullmatch: re's $ would also accept a trailing newline.
+        if not _MSISDN_RE.fullmatch(v):
+            raise ValueError("must be '+' followed by digits")
+        return v
+
+    @field_validator("ts")
+    @classmethod
+    def check_ts(cls, v: str) -> str:
+        # Fixed-shape YYYY-MM-DDTHH:MM:SSZ: positional char checks are a
+        # few ns vs a full regex walk.
+        if (
+            len(v) != 20
+            or v[4] != "-" or v[7] != "-" or v[10] != "T"
+            or v[13] != ":" or v[16] != ":" or v[19] != "Z"
+            or not (v[:4] + v[5:7] + v[8:10] + v[11:13] + v[14:16] + v[17:19]).isdecimal()
+        ):
+            raise ValueError("must be formatted as YYYY-MM-DDTHH:MM:SSZ")
+        return v
\ No newline at end of file
@@ -1,30 +1,127 @@
+import asyncio
+
 import aiosqlite
 from app.config import settings
 from app.models import INIT_SCRIPT
 
+# Upper bound on rows committed per transaction by the writer task.
+_MAX_BATCH = 256
+
+# RETURNING yields a row only when the insert actually happened, making
+# the duplicate path branchless and exception-free (needs SQLite >= 3.35).
+_INSERT_SQL = """
+INSERT INTO messages (message_id, from_msisdn, to_msisdn, ts, text, created_at)
+VALUES (:message_id, :from, :to, :ts, :text, :created_at)
+ON CONFLICT(message_id) DO NOTHING RETURNING message_id
+"""
+
+# Applied once per connection; WAL + NORMAL sync is the standard fast
+# configuration for a single-writer web workload.
+_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-64000;
+PRAGMA busy_timeout=5000;
+"""
+
+
+async def open_db() -> aiosqlite.Connection:
+    """Open the long-lived connection shared by all request handlers."""
+    # Default tuple rows: aiosqlite.Row allocation plus dict(Row) walks
+    # the column description per row, which the handlers don't need.
+    db = await aiosqlite.connect(settings.DB_PATH)
+    await db.executescript(_PRAGMAS)
+    return db
+
+
 async def init_db():
     """Run migration on startup."""
-    db_path = settings.DATABASE_URL.replace("sqlite:///", "")
-    async with aiosqlite.connect(db_path) as db:
-        await db.execute(INIT_SCRIPT)
+    db = await open_db()
+    try:
+        cursor = await db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='messages_fts'"
+        )
+        fts_existed = await cursor.fetchone() is not None
+        await db.executescript(INIT_SCRIPT)
+        if not fts_existed:
+            # The triggers only index writes made after the FTS table
+            # exists; rebuild once so rows from a pre-upgrade database
+            # are searchable too.
+            await db.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+        # Refresh planner statistics so the new indexes actually get picked.
+        await db.execute("ANALYZE")
         await db.commit()
+    finally:
+        await db.close()
+
 
-async def insert_message(msg_data: dict) -> bool:
+async def insert_message(msg_data: dict, db: aiosqlite.Connection) -> bool:
     """
     Returns True if inserted, False if duplicate (idempotent).
     """
-    db_path = settings.DATABASE_URL.replace("sqlite:///", "")
+    cursor = await db.execute(_INSERT_SQL, msg_data)
+    row = await cursor.fetchone()
+    await db.commit()
+    return row is not None
+
+
+async def submit_message(msg_data: dict, queue: asyncio.Queue) -> bool:
+    """
+    Hand a row to the writer task and wait for its batch to commit.
+    Returns True if inserted, False if duplicate (idempotent).
+    """
+    fut = asyncio.get_running_loop().create_future()
+    queue.put_nowait((fut, msg_data))
+    return await fut
+
+
+async def write_batches(queue: asyncio.Queue, db: aiosqlite.Connection):
+    """
+    Single-writer loop: drains queued rows and commits them in groups of
+    up to _MAX_BATCH, amortizing one fsync over the whole batch instead
+    of paying it per webhook. Each row's future resolves to the inserted
+    flag once its batch is durable.
+
+    `db` must be a connection dedicated to this task: read handlers on a
+    shared connection would see the batch's uncommitted rows.
+    """
+    batch = []
     try:
-        async with aiosqlite.connect(db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO messages (message_id, from_msisdn, to_msisdn, ts, text, created_at)
-                VALUES (:message_id, :from, :to, :ts, :text, :created_at)
-                """,
-                msg_data
-            )
-            await db.commit()
-            return True
-    except aiosqlite.IntegrityError:
-
-        return False
\ No newline at end of file
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < _MAX_BATCH:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                results = []
+                for _, row in batch:
+                    cursor = await db.execute(_INSERT_SQL, row)
+                    results.append(await cursor.fetchone() is not None)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                for fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                batch = []
+                continue
+
+            for (fut, _), inserted in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(inserted)
+            batch = []
+    finally:
+        # On cancellation, fail the in-flight batch and anything still
+        # queued so submit_message awaiters can't hang on shutdown.
+        while True:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        for fut, _ in batch:
+            if not fut.done():
+                fut.set_exception(RuntimeError("writer stopped before row was committed"))
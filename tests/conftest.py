@@ -3,7 +3,7 @@ import os
 import asyncio
 from fastapi.testclient import TestClient
 from app.main import app
-from app.storage import init_db, insert_message
+from app.storage import init_db, insert_message, open_db
 
 
 TEST_DB_FILE = "test_shared.db"
@@ -20,12 +20,16 @@ async def _seed_logic():
         {"message_id": "m3", "from": "+222", "to": "+999", "ts": "2025-01-03T10:00:00Z", "text": "Newest", "created_at": "2025-01-03T10:00:00Z"},
     ]
     
-    for m in messages:
-        
-        try:
-            await insert_message(m)
-        except Exception:
-            pass
+    db = await open_db()
+    try:
+        for m in messages:
+
+            try:
+                await insert_message(m, db)
+            except Exception:
+                pass
+    finally:
+        await db.close()
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
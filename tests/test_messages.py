@@ -27,4 +27,22 @@ async def test_list_messages_filter_since(client):
     ids = [d['message_id'] for d in data['data']]
     assert "m2" in ids
     assert "m3" in ids
-    assert "m1" not in ids
\ No newline at end of file
+    assert "m1" not in ids
+
+@pytest.mark.asyncio
+async def test_list_messages_search_q(client):
+
+    response = client.get("/messages", params={"q": "ewest"})
+    data = response.json()
+
+    assert [d['message_id'] for d in data['data']] == ["m3"]
+    assert data["total"] == 1
+
+@pytest.mark.asyncio
+async def test_list_messages_search_q_short(client):
+
+    # under 3 chars takes the LIKE fallback instead of FTS
+    response = client.get("/messages", params={"q": "Ol"})
+    data = response.json()
+
+    assert [d['message_id'] for d in data['data']] == ["m1"]
\ No newline at end of file